@@ -1,17 +1,35 @@
 # /// script
 # dependencies = [
 #     "matplotlib",
+#     "orjson",
 #     "pyqt6",
 # ]
 # ///
 import numpy as np
 
+import sys
+
+import matplotlib
+
+# figures are only written to disk with `--save`, no need to load a GUI toolkit
+if any(arg == "--save" or arg.startswith("--save=") for arg in sys.argv[1:]):
+    matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import matplotlib.colors as mcolors
 
 import argparse
-import json
+import math
+import warnings
+
+try:
+    import orjson as json
+except ImportError:
+    import json
+
+# above this many cells, text labels overlap and drawing them dominates the run
+MAX_OVERLAY_CELLS = 2500
 
 
 class ParseFloatStrPair(argparse.Action):
@@ -43,6 +61,52 @@ class ParseColorMap(argparse.Action):
         setattr(namespace, self.dest, cmap)
 
 
+def read_json(path):
+    try:
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        print(f"no such file: `{path}`")
+        exit(1)
+
+
+def block_mean(arr, max_cells):
+    """
+    average `arr` over rectangular blocks so that the result has at most
+    `max_cells` cells, keeping roughly the same aspect ratio
+
+    the input is padded with NaN up to a multiple of the block shape, missing
+    values are ignored in the averages.
+
+    returns the downsampled array and the (height, width) of a block.
+    """
+    h, w = arr.shape
+    if h * w <= max_cells:
+        return arr, (1, 1)
+
+    # start from square blocks, keeping at least one row of blocks and at most
+    # `max_cells` of them
+    b = math.ceil(math.sqrt(h * w / max_cells))
+    by = max(min(b, h), math.ceil(h / max_cells))
+    nh = math.ceil(h / by)
+    # give whatever budget is left to the columns, e.g. all of it when the grid
+    # is a single row of blocks, then give back to the rows what the columns
+    # could not use, e.g. when the grid is a single column
+    bx = math.ceil(w / min(w, max_cells // nh))
+    nw = math.ceil(w / bx)
+    by = math.ceil(h / min(h, max_cells // nw))
+    nh = math.ceil(h / by)
+    assert nh * nw <= max_cells, f"{h}x{w} downsampled to {nh}x{nw} > {max_cells} cells"
+
+    padded = np.full((nh * by, nw * bx), np.nan)
+    padded[:h, :w] = arr
+
+    with warnings.catch_warnings():
+        # blocks full of NaN are expected and should stay NaN
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(padded.reshape(nh, by, nw, bx), axis=(1, 3)), (by, bx)
+
+
 parser = argparse.ArgumentParser()
 parser.add_argument("values"         , nargs="*" , type=float                   )
 parser.add_argument("--width" , "-W"             , type=int   , required=True   )
@@ -64,10 +128,32 @@ parser.add_argument("--yticks"       , nargs="*" , action=ParseFloatStrPair
 parser.add_argument("--title"                    , type=str                     )
 parser.add_argument("--save"                     , type=str                     )
 parser.add_argument("--overlay"                  , action="store_true"          )
+parser.add_argument("--max-cells"                , type=int                     )
+parser.add_argument("--data-file", "-f"          , type=str                     )
 args = parser.parse_args()
 
-if args.width * args.height != len(args.values):
-    print(f"bad shape: {len(args.values)} values, -W={args.width}, -H={args.height}")
+if args.max_cells is not None and args.max_cells < 1:
+    parser.error(f"--max-cells: expected a positive number of cells, found {args.max_cells}")
+
+if args.data_file is not None:
+    if len(args.values) > 0:
+        parser.error("values and --data-file are mutually exclusive")
+    # missing values are written as `null` or `"NaN"` in JSON
+    try:
+        values = np.array(read_json(args.data_file), dtype=float)
+    except (TypeError, ValueError):
+        values = None
+    if values is None or values.ndim not in [1, 2]:
+        print(f"bad data file: `{args.data_file}`, expected a flat list or a 2D grid of numbers")
+        exit(1)
+    if values.ndim == 2 and values.shape != (args.height, args.width):
+        print(f"bad shape: {values.shape[0]}x{values.shape[1]} grid, -W={args.width}, -H={args.height}")
+        exit(1)
+else:
+    values = np.array(args.values, dtype=float)
+
+if args.width * args.height != values.size:
+    print(f"bad shape: {values.size} values, -W={args.width}, -H={args.height}")
     exit(1)
 
 if args.figsize is None:
@@ -89,19 +175,31 @@ else:
         norm = mcolors.Normalize(vmin=args.cbarmin, vmax=args.cbarmax)
 mappable = cm.ScalarMappable(norm=norm, cmap=cmap)
 
-if len(args.values) > 0:
-    arr = np.array(args.values, dtype=float).reshape((args.height, args.width))
-    arr = np.where(arr == None, np.nan, arr)
+if values.size > 0:
+    arr = values.reshape((args.height, args.width))
+
+    # each block is drawn over the cells it averages so that ticks given in cell
+    # coordinates still land at the right place, the padding is cropped below
+    h, w = arr.shape
+    extent = None
+    downsampled = args.max_cells is not None and arr.size > args.max_cells
+    if downsampled:
+        arr, (by, bx) = block_mean(arr, args.max_cells)
+        extent = (-0.5, arr.shape[1] * bx - 0.5, arr.shape[0] * by - 0.5, -0.5)
 
     if args.cbarmin is None and args.cbarmax is None:
-        im = plt.imshow(arr, cmap=cmap)
+        im = plt.imshow(arr, cmap=cmap, extent=extent)
     else:
         if args.cbarmin is None:
-            im = plt.imshow(arr, vmax=args.cbarmax, cmap=cmap)
+            im = plt.imshow(arr, vmax=args.cbarmax, cmap=cmap, extent=extent)
         elif args.cbarmax is None:
-            im = plt.imshow(arr, vmin=args.cbarmin, cmap=cmap)
+            im = plt.imshow(arr, vmin=args.cbarmin, cmap=cmap, extent=extent)
         else:
-            im = plt.imshow(arr, vmin=args.cbarmin, vmax=args.cbarmax, cmap=cmap)
+            im = plt.imshow(arr, vmin=args.cbarmin, vmax=args.cbarmax, cmap=cmap, extent=extent)
+
+    if downsampled:
+        ax.set_xlim(-0.5, w - 0.5)
+        ax.set_ylim(h - 0.5, -0.5)
 
     ax.set_xlabel(args.xlabel)
     ax.set_ylabel(args.ylabel)
@@ -116,28 +214,34 @@ if len(args.values) > 0:
             labels=[l for _, l in args.yticks],
         )
 
-    if args.overlay:
+    if args.overlay and downsampled:
+        print(f"skipping overlay: values have been averaged down to {arr.shape[0]}x{arr.shape[1]} cells")
+    elif args.overlay and arr.size > MAX_OVERLAY_CELLS:
+        print(f"skipping overlay: {arr.size} cells is more than {MAX_OVERLAY_CELLS}")
+    elif args.overlay:
         norm = im.norm
         cmap = im.cmap
         rgba = cmap(norm(arr))
 
-        for i in range(arr.shape[0]):
-            for j in range(arr.shape[1]):
-                # https://stackoverflow.com/a/596243
-                r, g, b, _ = rgba[i, j]
-                luminance = 0.299*r + 0.587*g + 0.114*b
+        # https://stackoverflow.com/a/596243
+        luminance = 0.299*rgba[..., 0] + 0.587*rgba[..., 1] + 0.114*rgba[..., 2]
+        bright = luminance > 0.5
 
+        # missing cells are drawn as blank, there is nothing to write on them
+        present = ~np.isnan(arr)
+        for color, mask in [("black", bright), ("white", ~bright)]:
+            for i, j in np.argwhere(mask & present):
                 ax.text(
                     j, i, arr[i, j],
                     ha="center", va="center",
-                    color="black" if luminance > 0.5 else "white",
+                    color=color,
                 )
 
     if args.title is not None:
         ax.set_title(args.title)
 
 if args.cbar:
-    cax = ax if len(args.values) == 0 else None
+    cax = ax if values.size == 0 else None
     cbar = fig.colorbar(mappable, ax=ax, label=args.cbarlabel, orientation=args.cbardir, cax=cax)
     if args.cbarticks is not None:
         cbar.set_ticks([t for t, _ in args.cbarticks])
@@ -1,17 +1,31 @@
 # /// script
 # dependencies = [
 #     "matplotlib",
+#     "orjson",
 #     "pyqt6",
 # ]
 # ///
 import numpy as np
 
+import sys
+
+import matplotlib
+
+# figures are only written to disk with `--save` or `--server`, no need to load
+# a GUI toolkit
+if any(arg in ["--save", "--server"] or arg.startswith("--save=") for arg in sys.argv[1:]):
+    matplotlib.use("Agg")
+
 import matplotlib.pyplot as plt
 import matplotlib.cm as cm
 import matplotlib.colors as mcolors
 
 import argparse
-import json
+
+try:
+    import orjson as json
+except ImportError:
+    import json
 
 
 class ParseRGBA2D(argparse.Action):
@@ -19,24 +33,106 @@ class ParseRGBA2D(argparse.Action):
         super().__init__(option_strings, dest, nargs=nargs, **kwargs)
 
     def __call__(self, parser, namespace, values, option_string=None):
-        setattr(namespace, self.dest, np.array(json.loads(values)))
+        # called with the default when the positional is omitted
+        if values is not None:
+            values = np.array(json.loads(values))
+        setattr(namespace, self.dest, values)
+
+def read_json(path):
+    try:
+        with open(path, "rb") as f:
+            return json.loads(f.read())
+    except FileNotFoundError:
+        print(f"no such file: `{path}`")
+        exit(1)
+
+def rgba_grid(data):
+    # `None` if `data` is not a 2D grid of RGB or RGBA pixels
+    try:
+        arr = np.array(data)
+    except (TypeError, ValueError):
+        return None
+    if arr.ndim != 3 or arr.shape[-1] not in [3, 4] or not np.issubdtype(arr.dtype, np.number):
+        return None
+    return arr
+
+def draw(ax, values):
+    ax.cla()
+    ax.imshow(values)
+
+    ax.set_xticks([])
+    ax.set_yticks([])
 
 parser = argparse.ArgumentParser()
-parser.add_argument("values"                     , action=ParseRGBA2D        )
+parser.add_argument("values"         , nargs="?" , action=ParseRGBA2D        )
+parser.add_argument("--data-file", "-f"          , type=str                  )
 parser.add_argument("--figsize"      , nargs=2   , type=float                )
 parser.add_argument("--dpi"                      , type=int   , default=300  )
 parser.add_argument("--save"                     , type=str                  )
+parser.add_argument("--server"                   , action="store_true"       )
 args = parser.parse_args()
 
+# read one job per line on stdin, e.g.
+# `{"values": [[[0, 0, 0, 255]]], "save": "a.png", "figsize": [1, 1], "dpi": 150}`,
+# so that Python and Matplotlib are only loaded once for a whole batch of images
+#
+# the same figure is cleared and resized for every job
+if args.server:
+    for option, value in [("values", args.values), ("--data-file", args.data_file), ("--save", args.save)]:
+        if value is not None:
+            parser.error(f"{option} can not be used with --server, give it in the jobs instead")
+
+    if args.figsize is None:
+        fig, ax = plt.subplots(layout="constrained")
+    else:
+        fig, ax = plt.subplots(layout="constrained", figsize=args.figsize)
+    default_figsize = fig.get_size_inches()
+
+    for n, line in enumerate(sys.stdin, start=1):
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except ValueError as e:
+            print(f"invalid job on line {n}: {e}")
+            exit(1)
+        if not isinstance(job, dict):
+            print(f"invalid job on line {n}: expected an object")
+            exit(1)
+        for key in ["values", "save"]:
+            if key not in job:
+                print(f"invalid job on line {n}: missing `{key}`")
+                exit(1)
+        values = rgba_grid(job["values"])
+        if values is None:
+            print(f"invalid job on line {n}: `values` should be a 2D grid of RGB or RGBA pixels")
+            exit(1)
+
+        fig.set_size_inches(job.get("figsize", default_figsize))
+        draw(ax, values)
+        fig.savefig(job["save"], dpi=job.get("dpi", args.dpi))
+        print(f"Generated {job['save']}")
+    exit(0)
+
+if args.data_file is not None:
+    if args.values is not None:
+        parser.error("values and --data-file are mutually exclusive")
+    try:
+        args.values = rgba_grid(read_json(args.data_file))
+    except ValueError:
+        args.values = None
+    if args.values is None:
+        print(f"bad data file: `{args.data_file}`, expected a 2D grid of RGB or RGBA pixels")
+        exit(1)
+elif args.values is None:
+    parser.error("one of values, --data-file or --server is required")
+
 if args.figsize is None:
     fig, ax = plt.subplots(layout="constrained")
 else:
     fig, ax = plt.subplots(layout="constrained", figsize=args.figsize)
 
-plt.imshow(args.values)
-
-ax.set_xticks([])
-ax.set_yticks([])
+draw(ax, args.values)
 
 if args.save is not None:
     plt.savefig(args.save, dpi=args.dpi)